@@ -7,11 +7,20 @@ import os
 import json
 import subprocess
 from datetime import datetime
-from flask import Flask, request, jsonify, render_template_string, redirect, url_for
+from flask import Flask, Response, request, jsonify, render_template, render_template_string, redirect, url_for
 from google.cloud import firestore, storage
+from jinja2 import FileSystemBytecodeCache
 
 app = Flask(__name__)
 
+# Cache compiled templates on disk so restarted workers skip Jinja's parse/compile step.
+# Cached bytecode is executed, so by default Jinja picks a per-user temp directory
+# and checks its owner and mode; JINJA_CACHE_DIR is an explicit override only.
+JINJA_CACHE_DIR = os.getenv('JINJA_CACHE_DIR')
+if JINJA_CACHE_DIR:
+    os.makedirs(JINJA_CACHE_DIR, mode=0o700, exist_ok=True)
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory=JINJA_CACHE_DIR)
+
 # Initialize GCP clients
 try:
     db = firestore.Client()
@@ -64,6 +73,36 @@ REGISTERED_APPS = {
     }
 }
 
+# Registered apps are fixed at startup, so resolve their enabled flags once
+MY_APP_ENABLED = REGISTERED_APPS['my-app']['enabled']
+MEDICAL_APPOINTMENTS_ENABLED = REGISTERED_APPS['medical-appointments']['enabled']
+
+# Navigation hints for the /apps hub so browsers can prerender/prefetch the next page
+APPS_SPECULATION_RULES = json.dumps({
+    'prerender': [{
+        'urls': ['/load-app-form', '/my-app', '/medical-appointments'],
+        'eagerness': 'moderate'
+    }]
+})
+APPS_PREFETCH_LINKS = '</load-app-form>; rel=prefetch, </my-app>; rel=prefetch'
+
+# Headers not copied from proxied responses: hop-by-hop ones, plus body framing
+# and encoding since the body is re-chunked (and already decoded) by requests
+HOP_BY_HOP_HEADERS = frozenset({
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+    'te', 'trailers', 'transfer-encoding', 'upgrade',
+    'content-length', 'content-encoding'
+})
+
+def proxy_response(resp):
+    """Stream a proxied upstream response back with its end-to-end headers"""
+    out_headers = [(key, value) for key, value in resp.raw.headers.items()
+                   if key.lower() not in HOP_BY_HOP_HEADERS]
+    response = Response(resp.iter_content(chunk_size=64 * 1024), status=resp.status_code, headers=out_headers)
+    # Runs once the body is sent or the client goes away
+    response.call_on_close(resp.close)
+    return response
+
 def validate_api_request():
     """Simple validation for API requests"""
     return True  # Simplified for now
@@ -713,7 +752,7 @@ def proxy_external_app(path=''):
         
         # Proxy the request
         if request.method == 'GET':
-            resp = requests.get(target_url, params=request.args, timeout=30)
+            resp = requests.get(target_url, params=request.args, timeout=30, stream=True)
         else:
             resp = requests.request(
                 method=request.method,
@@ -721,10 +760,11 @@ def proxy_external_app(path=''):
                 headers={key: value for (key, value) in request.headers if key != 'Host'},
                 data=request.get_data(),
                 params=request.args,
-                timeout=30
+                timeout=30,
+                stream=True
             )
         
-        return resp.content, resp.status_code, resp.headers.items()
+        return proxy_response(resp)
         
     except Exception as e:
         return render_template_string("""
@@ -743,227 +783,31 @@ def proxy_external_app(path=''):
 @app.route('/apps')
 def list_apps():
     """List all available Python applications"""
-    return render_template_string("""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Available Python Apps</title>
-        <style>
-            body { font-family: Arial, sans-serif; margin: 40px; background: #f5f5f5; }
-            .container { max-width: 800px; margin: 0 auto; background: white; padding: 30px; border-radius: 10px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }
-            .app-card { border: 1px solid #ddd; padding: 20px; margin: 15px 0; border-radius: 8px; background: #f9f9f9; }
-            .app-card.enabled { border-left: 4px solid #28a745; }
-            .app-card.disabled { border-left: 4px solid #dc3545; opacity: 0.7; }
-            .btn { padding: 8px 16px; margin: 5px; border: none; border-radius: 4px; text-decoration: none; display: inline-block; }
-            .btn-primary { background: #007bff; color: white; }
-            .btn-success { background: #28a745; color: white; }
-            .btn-secondary { background: #6c757d; color: white; }
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>🚀 Available Python Applications</h1>
-            <p>Choose from the applications available on this server:</p>
-            
-            {% for app_id, app in registered_apps.items() %}
-            <div class="app-card {{ 'enabled' if app.enabled else 'disabled' }}">
-                <h3>{{ app.name }}</h3>
-                <p>{{ app.description }}</p>
-                <p><strong>Route:</strong> <code>{{ app.route }}</code></p>
-                
-                {% if app.enabled %}
-                    <a href="{{ app.route }}" class="btn btn-primary">Open App</a>
-                    <span style="color: #28a745;">● Active</span>
-                {% else %}
-                    <button class="btn btn-secondary" disabled>Not Available</button>
-                    <span style="color: #dc3545;">● Disabled</span>
-                {% endif %}
-            </div>
-            {% endfor %}
-            
-            <div class="app-card enabled">
-                <h3>External Apps</h3>
-                <p>Link to external Python applications via proxy</p>
-                <p><strong>Route:</strong> <code>/external-app</code></p>
-                <a href="/external-app" class="btn btn-primary">Access External App</a>
-                <a href="/load-app-form" class="btn btn-success">Configure External App</a>
-            </div>
-            
-            <hr style="margin: 30px 0;">
-            <a href="/" class="btn btn-secondary">← Back to Main App</a>
-        </div>
-    </body>
-    </html>
-    """, registered_apps=REGISTERED_APPS)
+    return render_template('apps.html', registered_apps=REGISTERED_APPS, speculation_rules=APPS_SPECULATION_RULES), {'Link': APPS_PREFETCH_LINKS}
 
 @app.route('/load-app-form')
 def load_app_form():
     """Web form to configure external app"""
-    return render_template_string("""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Configure External App</title>
-        <style>
-            body { font-family: Arial, sans-serif; margin: 40px; background: #f5f5f5; }
-            .container { max-width: 600px; margin: 0 auto; background: white; padding: 30px; border-radius: 10px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }
-            .form-group { margin: 20px 0; }
-            label { display: block; margin-bottom: 5px; font-weight: bold; }
-            input, select { width: 100%; padding: 10px; border: 1px solid #ddd; border-radius: 4px; font-size: 16px; }
-            .btn { padding: 12px 24px; background: #007bff; color: white; border: none; border-radius: 4px; cursor: pointer; font-size: 16px; }
-            .btn:hover { background: #0056b3; }
-            .btn-secondary { background: #6c757d; text-decoration: none; display: inline-block; text-align: center; }
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>🔗 Configure External Python App</h1>
-            <p>Link your external Python application to this infrastructure:</p>
-            
-            <form id="appForm">
-                <div class="form-group">
-                    <label for="app_url">Application URL:</label>
-                    <input type="url" id="app_url" name="app_url" 
-                           placeholder="https://your-python-app.com" required>
-                </div>
-                
-                <div class="form-group">
-                    <label for="type">Integration Type:</label>
-                    <select id="type" name="type">
-                        <option value="proxy">Proxy (Recommended)</option>
-                    </select>
-                </div>
-                
-                <button type="submit" class="btn">Configure App</button>
-                <a href="/apps" class="btn btn-secondary">Cancel</a>
-            </form>
-            
-            <div id="result" style="margin-top: 20px; display: none;"></div>
-        </div>
-        
-        <script>
-            document.getElementById('appForm').addEventListener('submit', async function(e) {
-                e.preventDefault();
-                
-                const formData = new FormData(e.target);
-                const data = Object.fromEntries(formData);
-                
-                try {
-                    const response = await fetch('/load-app', {
-                        method: 'POST',
-                        headers: { 'Content-Type': 'application/json' },
-                        body: JSON.stringify(data)
-                    });
-                    
-                    const result = await response.json();
-                    const resultDiv = document.getElementById('result');
-                    
-                    if (response.ok) {
-                        resultDiv.innerHTML = `
-                            <div style="background: #d4edda; color: #155724; padding: 15px; border-radius: 4px;">
-                                <h3>✅ Success!</h3>
-                                <p>${result.message}</p>
-                                <p><strong>Your app is now available at:</strong> <a href="/external-app">/external-app</a></p>
-                            </div>
-                        `;
-                    } else {
-                        resultDiv.innerHTML = `
-                            <div style="background: #f8d7da; color: #721c24; padding: 15px; border-radius: 4px;">
-                                <h3>❌ Error</h3>
-                                <p>${result.error}</p>
-                            </div>
-                        `;
-                    }
-                    
-                    resultDiv.style.display = 'block';
-                } catch (error) {
-                    console.error('Error:', error);
-                }
-            });
-        </script>
-    </body>
-    </html>
-    """)
+    return render_template('load_app_form.html')
 
 # Example custom app routes (you can add your own here)
 @app.route('/my-app')
 def my_custom_app():
     """Your custom Python application"""
-    if not REGISTERED_APPS['my-app']['enabled']:
+    if not MY_APP_ENABLED:
         return "This app is currently disabled", 404
         
-    return render_template_string("""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>My Custom App</title>
-        <style>
-            body { font-family: Arial, sans-serif; margin: 40px; background: #f5f5f5; }
-            .container { max-width: 800px; margin: 0 auto; background: white; padding: 30px; border-radius: 10px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }
-            .feature-box { background: #e3f2fd; padding: 20px; margin: 15px 0; border-radius: 8px; border-left: 4px solid #2196f3; }
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>🎯 My Custom Python App</h1>
-            <p>This is where your custom Python application logic goes!</p>
-            
-            <div class="feature-box">
-                <h3>🚀 Auto-scaling Features</h3>
-                <p>Your app automatically scales with Cloud Run:</p>
-                <ul>
-                    <li>✅ Scales from 0 to unlimited instances</li>
-                    <li>✅ Pay only for actual usage</li>
-                    <li>✅ Automatic load balancing</li>
-                    <li>✅ Built-in health monitoring</li>
-                </ul>
-            </div>
-            
-            <div class="feature-box">
-                <h3>🔧 Available Resources</h3>
-                <p>Your app has access to:</p>
-                <ul>
-                    <li>📊 Firestore Database: <code>{{ 'Connected' if gcp_available else 'Local Mode' }}</code></li>
-                    <li>☁️ Cloud Storage: <code>{{ 'Available' if gcp_available else 'Local Mode' }}</code></li>
-                    <li>🌐 REST API endpoints</li>
-                    <li>🔒 Secure VPC networking</li>
-                </ul>
-            </div>
-            
-            <!-- Add your custom app content here -->
-            <div class="feature-box">
-                <h3>💡 Add Your Code Here</h3>
-                <p>Replace this section with your actual Python application:</p>
-                <pre style="background: #f4f4f4; padding: 15px; border-radius: 4px;">
-# Example: Add your routes in compute-service.py
-@app.route('/my-app/feature1')
-def my_feature():
-    # Your Python logic here
-    return "Hello from your custom feature!"
-                </pre>
-            </div>
-            
-            <hr style="margin: 30px 0;">
-            <a href="/apps" style="color: #007bff; text-decoration: none;">← Back to App List</a> |
-            <a href="/" style="color: #007bff; text-decoration: none;">Main Dashboard</a>
-        </div>
-    </body>
-    </html>
-    """, gcp_available=gcp_available)
+    return render_template('my_app.html', gcp_available=gcp_available)
 
 @app.route('/medical-appointments')
 @app.route('/medical-appointments/<path:path>')
 def medical_appointments_app(path=''):
     """Medical Appointments API - Full Featured System"""
-    if not REGISTERED_APPS['medical-appointments']['enabled']:
+    if not MEDICAL_APPOINTMENTS_ENABLED:
         return "Medical Appointments API is currently disabled", 404
     
     try:
-        # Import the medical appointments service
         import requests
-        import subprocess
-        import time
-        from threading import Thread
         
         # Check if medical appointments service is running on port 8080
         try:
@@ -973,7 +817,7 @@ def medical_appointments_app(path=''):
                 target_url = f"http://localhost:8080/{path}" if path else "http://localhost:8080/"
                 
                 if request.method == 'GET':
-                    resp = requests.get(target_url, params=request.args, timeout=30)
+                    resp = requests.get(target_url, params=request.args, timeout=30, stream=True)
                 else:
                     resp = requests.request(
                         method=request.method,
@@ -981,91 +825,16 @@ def medical_appointments_app(path=''):
                         headers={key: value for (key, value) in request.headers if key != 'Host'},
                         data=request.get_data(),
                         params=request.args,
-                        timeout=30
+                        timeout=30,
+                        stream=True
                     )
                 
-                return resp.content, resp.status_code, resp.headers.items()
+                return proxy_response(resp)
         except requests.exceptions.RequestException:
             pass
         
         # Service not running, show information page
-        return render_template_string("""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>Medical Appointments API</title>
-            <style>
-                body { font-family: Arial, sans-serif; margin: 40px; background: #f5f5f5; }
-                .container { max-width: 800px; margin: 0 auto; background: white; padding: 30px; border-radius: 10px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }
-                .feature-box { background: #e8f5e8; padding: 20px; margin: 15px 0; border-radius: 8px; border-left: 4px solid #4caf50; }
-                .info-box { background: #fff3cd; padding: 20px; margin: 15px 0; border-radius: 8px; border-left: 4px solid #ffc107; }
-                .btn { display: inline-block; padding: 12px 24px; background: #4caf50; color: white; text-decoration: none; border-radius: 5px; margin: 5px; }
-                .btn:hover { background: #45a049; }
-                .command { background: #f4f4f4; padding: 10px; border-radius: 4px; font-family: monospace; margin: 10px 0; }
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <h1>🏥 Medical Appointments API</h1>
-                <p>Full-featured medical appointment scheduling system integrated with your GCP infrastructure.</p>
-                
-                <div class="info-box">
-                    <h3>📋 Service Status</h3>
-                    <p><strong>Status:</strong> Not currently running</p>
-                    <p><strong>Expected Port:</strong> 8080</p>
-                    <p>To start the service, run the following command:</p>
-                    <div class="command">cd /Users/pramosba/gcp-IaC-PoC/services && python medical-appointments-service.py</div>
-                </div>
-                
-                <div class="feature-box">
-                    <h3>🚀 Auto-scaling Features</h3>
-                    <p>The Medical Appointments API includes:</p>
-                    <ul>
-                        <li>✅ Auto-scaling with Cloud Run</li>
-                        <li>✅ SQLAlchemy with MySQL/SQLite fallback</li>
-                        <li>✅ Firestore integration for backup</li>
-                        <li>✅ RESTful API endpoints</li>
-                        <li>✅ Multi-language support (English/Spanish)</li>
-                        <li>✅ CORS enabled for web applications</li>
-                        <li>✅ Comprehensive test suite</li>
-                    </ul>
-                </div>
-                
-                <div class="feature-box">
-                    <h3>🔧 API Endpoints</h3>
-                    <p>Available when service is running:</p>
-                    <ul>
-                        <li><code>GET /</code> - Main dashboard</li>
-                        <li><code>GET /health</code> - Health check</li>
-                        <li><code>POST /api/schedules</code> - Create medical schedules</li>
-                        <li><code>GET /api/schedules</code> - List schedules</li>
-                        <li><code>POST /api/appointments/reserve</code> - Reserve appointment</li>
-                        <li><code>POST /api/appointments/cancel</code> - Cancel appointment</li>
-                        <li><code>GET /api/docs</code> - API documentation</li>
-                        <li><code>GET /api/test</code> - Interactive testing</li>
-                    </ul>
-                </div>
-                
-                <div class="feature-box">
-                    <h3>🧪 Testing</h3>
-                    <p>Run comprehensive tests:</p>
-                    <div class="command">cd /Users/pramosba/gcp-IaC-PoC/tests && python run_tests.py</div>
-                </div>
-                
-                <hr style="margin: 30px 0;">
-                <a href="/apps" class="btn">← Back to App List</a>
-                <a href="/" class="btn">Main Dashboard</a>
-                <button onclick="startService()" class="btn" style="background: #2196f3;">🚀 Start Service</button>
-            </div>
-            
-            <script>
-                function startService() {
-                    alert('To start the Medical Appointments API service:\\n\\n1. Open a new terminal\\n2. Run: cd /Users/pramosba/gcp-IaC-PoC/services\\n3. Run: python medical-appointments-service.py\\n\\nThe service will be available at http://localhost:8080');
-                }
-            </script>
-        </body>
-        </html>
-        """)
+        return render_template('medical_info.html')
         
     except Exception as e:
         return f"Error accessing Medical Appointments API: {str(e)}", 500
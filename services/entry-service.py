@@ -3,10 +3,20 @@
 Entry Service - Gateway and Load Balancer
 Provides public access point and routes to your Python app
 """
+import hashlib
+import orjson
 import os
+import random
+import threading
+import time
 import requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from flask import Flask, request, jsonify, render_template_string, redirect
+from flask import Flask, Response, request, redirect
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from werkzeug.http import parse_etags, quote_etag
 
 app = Flask(__name__)
 
@@ -14,24 +24,228 @@ app = Flask(__name__)
 API_ENDPOINT = os.getenv('API_ENDPOINT', 'http://localhost:8081')
 COMPUTE_ENDPOINT = os.getenv('COMPUTE_ENDPOINT', 'http://localhost:8080')
 
+# Longest wait between retries, whatever Retry-After an upstream asks for: the
+# sleep happens inside the call, holding a bulkhead slot and a worker thread
+RETRY_AFTER_MAX = 1.0
+
+class JitterRetry(Retry):
+    """Retry policy that sleeps a random time up to the exponential backoff (full jitter)
+
+    Retry-After is honoured only up to RETRY_AFTER_MAX seconds.
+    """
+
+    def get_backoff_time(self):
+        return random.uniform(0, super().get_backoff_time())
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, RETRY_AFTER_MAX)
+
+# Upstream answers that mean the backend is unhealthy rather than the request bad
+UPSTREAM_FAILURE_STATUSES = (502, 503, 504)
+
+# Transient upstream errors are retried for idempotent methods only; POSTs are never
+# re-sent after reaching the backend. A refused connection is retried once; read
+# timeouts are never retried, so a hung backend costs one timeout, not four
+UPSTREAM_RETRY = JitterRetry(
+    total=3,
+    connect=1,
+    read=0,
+    backoff_factor=0.2,
+    status_forcelist=UPSTREAM_FAILURE_STATUSES,
+    allowed_methods=frozenset({'GET', 'HEAD', 'OPTIONS'}),
+    respect_retry_after_header=True,
+    raise_on_status=False
+)
+
+# Shared HTTP client: keeps upstream connections alive between proxied requests.
+# Upstreams are spoken to over pooled HTTP/1.1 keep-alive rather than HTTP/2: the
+# retry policy above is a urllib3 feature, Cloud Run terminates TLS in front of
+# each service anyway, and with up to 128 idle connections per host concurrent
+# calls are not queued behind each other.
+UPSTREAM_ADAPTER = HTTPAdapter(pool_connections=32, pool_maxsize=128, pool_block=False, max_retries=UPSTREAM_RETRY)
+SESSION = requests.Session()
+SESSION.mount('http://', UPSTREAM_ADAPTER)
+SESSION.mount('https://', UPSTREAM_ADAPTER)
+
+class CircuitOpenError(requests.RequestException):
+    """Raised instead of calling an upstream whose circuit is open"""
+
+class CircuitBreaker:
+    """Per-upstream circuit breaker (closed -> open -> half_open)
+
+    After fail_max consecutive failures (connection errors or 502/503/504
+    answers) the circuit opens and calls fail fast with CircuitOpenError; once
+    reset_timeout seconds have passed a single trial call is let through and
+    its outcome closes or re-opens the circuit. Other callers keep failing fast
+    while the trial is in flight.
+    """
+
+    def __init__(self, name, fail_max=5, reset_timeout=30):
+        self.name = name
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.fail_count = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    def call(self, func, *args, **kwargs):
+        with self.lock:
+            if self.state == 'open':
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    raise CircuitOpenError(f"{self.name} circuit is open")
+                self.state = 'half_open'
+            if self.state == 'half_open':
+                if self.trial_in_flight:
+                    raise CircuitOpenError(f"{self.name} circuit is half-open, trial call in flight")
+                self.trial_in_flight = True
+        try:
+            result = func(*args, **kwargs)
+        except requests.RequestException:
+            self.record_failure()
+            raise
+        except BaseException:
+            with self.lock:
+                self.trial_in_flight = False
+            raise
+        if result.status_code in UPSTREAM_FAILURE_STATUSES:
+            self.record_failure()
+        else:
+            self.record_success()
+        return result
+
+    def record_failure(self):
+        with self.lock:
+            self.trial_in_flight = False
+            self.fail_count += 1
+            if self.state == 'half_open' or self.fail_count >= self.fail_max:
+                if self.state != 'open':
+                    app.logger.warning(f"Circuit for {self.name} service opened after {self.fail_count} failures")
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    def record_success(self):
+        with self.lock:
+            self.trial_in_flight = False
+            self.state = 'closed'
+            self.fail_count = 0
+
+API_BREAKER = CircuitBreaker('api')
+COMPUTE_BREAKER = CircuitBreaker('compute')
+
+class BulkheadFullError(requests.RequestException):
+    """Raised when an upstream already has its maximum number of calls in flight"""
+
+# Bulkheads cap in-flight calls per upstream within a worker process so a slow
+# backend cannot occupy every request thread. Sized from the gunicorn thread count
+# (gunicorn.conf.py) so that both together leave a quarter of the threads free
+WORKER_THREADS = int(os.getenv('GUNICORN_THREADS', 16))
+API_BULKHEAD = threading.BoundedSemaphore(max(1, WORKER_THREADS // 4))
+COMPUTE_BULKHEAD = threading.BoundedSemaphore(max(1, WORKER_THREADS // 2))
+BULKHEAD_WAIT = 0.1
+
+# (connect, read) timeouts per call type; tune read timeouts slightly above the observed p95
+HEALTH_TIMEOUT = (1.0, 3.0)
+PROXY_TIMEOUT = (2.0, 25.0)
+SHELL_TIMEOUT = (1.0, 10.0)
+
+# Recent successful call latencies (seconds) per upstream, reported by /api/status
+UPSTREAM_LATENCY = {'api': deque(maxlen=1000), 'compute': deque(maxlen=1000)}
+
+def latency_p95(service):
+    """95th percentile of recent call latencies to a service, in milliseconds"""
+    samples = sorted(UPSTREAM_LATENCY[service])
+    if not samples:
+        return None
+    return round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 1)
+
+def call_upstream(breaker, bulkhead, method, url, **kwargs):
+    """Send a request to an upstream service through its bulkhead and circuit breaker
+
+    Streamed responses keep their bulkhead slot until the body has been relayed:
+    proxy_response releases it when the client response is closed.
+    """
+    if not bulkhead.acquire(timeout=BULKHEAD_WAIT):
+        raise BulkheadFullError(f"Too many in-flight requests to {breaker.name} service")
+    try:
+        started = time.monotonic()
+        resp = breaker.call(SESSION.request, method, url, **kwargs)
+    except BaseException:
+        bulkhead.release()
+        raise
+    UPSTREAM_LATENCY[breaker.name].append(time.monotonic() - started)
+    if kwargs.get('stream'):
+        resp.bulkhead = bulkhead
+    else:
+        bulkhead.release()
+    return resp
+
+# Connection-scoped headers that must not be forwarded by a proxy (RFC 7230 6.1),
+# plus host/content-length which requests recomputes for the upstream hop
+HOP_BY_HOP = frozenset({
+    'host', 'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+    'te', 'trailers', 'transfer-encoding', 'upgrade', 'content-length',
+})
+# requests has already decoded the body, so its encoding no longer applies
+PROXY_EXCLUDED_HEADERS = HOP_BY_HOP | {'content-encoding'}
+
+def ojson(obj, status=200):
+    """JSON response serialized with orjson"""
+    return Response(orjson.dumps(obj), status=status, mimetype='application/json')
+
+def page_etag(html):
+    """Strong ETag for a pre-rendered page"""
+    return hashlib.blake2b(html.encode('utf-8'), digest_size=8).hexdigest()
+
+def cached_page(html, etag, **cache_control):
+    """Serve a pre-rendered page, answering 304 when the client's copy is current"""
+    resp = Response(html, mimetype='text/html')
+    resp.set_etag(etag)
+    for directive, value in cache_control.items():
+        setattr(resp.cache_control, directive, value)
+    return resp.make_conditional(request)
+
+def proxy_response(resp):
+    """Stream an upstream response to the client as its bytes arrive"""
+    headers = [(key, value) for key, value in resp.raw.headers.items()
+               if key.lower() not in PROXY_EXCLUDED_HEADERS]
+    response = Response(resp.iter_content(chunk_size=64 * 1024), status=resp.status_code, headers=headers)
+    # Runs once the body is sent or the client goes away
+    response.call_on_close(resp.close)
+    bulkhead = getattr(resp, 'bulkhead', None)
+    if bulkhead is not None:
+        response.call_on_close(bulkhead.release)
+    return response
+
+# Constant bodies for the hot trivial endpoints. Only the bytes are shared: a
+# Response object is mutated by Flask/werkzeug while it is sent, so each request
+# still gets its own.
+HEALTH_BODY = b'{"service":"entry","status":"ok"}\n'
+CONFIGURED_BODY = b'{"status":"configured"}\n'
+
 @app.route('/health')
 def health():
-    return jsonify({'status': 'ok', 'service': 'entry'})
+    return Response(HEALTH_BODY, mimetype='application/json')
 
 @app.route('/configure', methods=['POST'])
 def configure():
     """Configure entry service"""
     config = request.json or {}
-    global API_ENDPOINT, COMPUTE_ENDPOINT
+    global API_ENDPOINT, COMPUTE_ENDPOINT, STATUS_HTML
     API_ENDPOINT = config.get('api_endpoint', API_ENDPOINT)
     COMPUTE_ENDPOINT = config.get('compute_endpoint', COMPUTE_ENDPOINT)
+    STATUS_HTML = render_status_page()
+    with STATUS_CACHE_LOCK:
+        STATUS_CACHE.clear()
     app.logger.info(f"Entry service configured: API={API_ENDPOINT}, COMPUTE={COMPUTE_ENDPOINT}")
-    return jsonify({'status': 'configured'})
+    return Response(CONFIGURED_BODY, mimetype='application/json')
 
-@app.route('/')
-def index():
-    """Main landing page with app access"""
-    return render_template_string("""
+# Landing page is fully static, so it is built once at import
+INDEX_HTML = """
     <!DOCTYPE html>
     <html>
     <head>
@@ -157,7 +371,52 @@ def index():
         </div>
     </body>
     </html>
-    """)
+    """
+INDEX_ETAG = page_etag(INDEX_HTML)
+
+@app.route('/')
+def index():
+    """Main landing page with app access"""
+    return cached_page(INDEX_HTML, INDEX_ETAG, max_age=300)
+
+# Served when the compute service cannot be reached; takes no arguments, so it is a constant
+UNAVAILABLE_HTML = """
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <title>Service Unavailable</title>
+        <style>
+            body { font-family: Arial, sans-serif; margin: 40px; text-align: center; background: #f5f5f5; }
+            .error-container { 
+                max-width: 600px; margin: 0 auto; 
+                background: white; padding: 40px; 
+                border-radius: 10px; box-shadow: 0 4px 12px rgba(0,0,0,0.1);
+            }
+            .error-icon { font-size: 4em; color: #ea4335; margin-bottom: 20px; }
+            .btn { 
+                display: inline-block; padding: 12px 24px; 
+                background: #4285f4; color: white; 
+                text-decoration: none; border-radius: 5px; 
+                margin: 10px;
+            }
+        </style>
+    </head>
+    <body>
+        <div class="error-container">
+            <div class="error-icon">⚠️</div>
+            <h1>Python App Temporarily Unavailable</h1>
+            <p>The compute service is starting up or temporarily unavailable.</p>
+            <p>Please try again in a few moments.</p>
+            <a href="/" class="btn">← Back to Gateway</a>
+            <a href="/status" class="btn">Check Status</a>
+        </div>
+    </body>
+    </html>
+    """
+
+def request_has_body():
+    """Whether the incoming request declares a body (Content-Length or chunked)"""
+    return bool(request.content_length) or 'chunked' in request.headers.get('Transfer-Encoding', '').lower()
 
 @app.route('/app')
 @app.route('/app/<path:path>')
@@ -168,55 +427,28 @@ def python_app(path=''):
         target_url = f"{COMPUTE_ENDPOINT}/{path}"
         
         if request.method == 'GET':
-            resp = requests.get(target_url, params=request.args, timeout=30)
+            resp = call_upstream(COMPUTE_BREAKER, COMPUTE_BULKHEAD, 'GET', target_url,
+                                 params=request.args, timeout=PROXY_TIMEOUT, stream=True)
         else:
-            resp = requests.request(
-                method=request.method,
-                url=target_url,
-                headers={key: value for (key, value) in request.headers if key != 'Host'},
-                data=request.get_data(),
+            resp = call_upstream(
+                COMPUTE_BREAKER, COMPUTE_BULKHEAD,
+                request.method,
+                target_url,
+                headers=dict((k, v) for k, v in request.headers if k.lower() not in HOP_BY_HOP),
+                # Only requests that carry a body get one upstream; passing an empty
+                # stream would make requests send Transfer-Encoding: chunked
+                data=request.stream if request_has_body() else None,
                 params=request.args,
-                timeout=30
+                timeout=PROXY_TIMEOUT,
+                stream=True
             )
         
-        # Return the response from compute service
-        return resp.content, resp.status_code, resp.headers.items()
+        # Stream the response from compute service
+        return proxy_response(resp)
         
     except requests.RequestException as e:
         app.logger.error(f"Failed to proxy to compute service: {e}")
-        return render_template_string("""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>Service Unavailable</title>
-            <style>
-                body { font-family: Arial, sans-serif; margin: 40px; text-align: center; background: #f5f5f5; }
-                .error-container { 
-                    max-width: 600px; margin: 0 auto; 
-                    background: white; padding: 40px; 
-                    border-radius: 10px; box-shadow: 0 4px 12px rgba(0,0,0,0.1);
-                }
-                .error-icon { font-size: 4em; color: #ea4335; margin-bottom: 20px; }
-                .btn { 
-                    display: inline-block; padding: 12px 24px; 
-                    background: #4285f4; color: white; 
-                    text-decoration: none; border-radius: 5px; 
-                    margin: 10px;
-                }
-            </style>
-        </head>
-        <body>
-            <div class="error-container">
-                <div class="error-icon">⚠️</div>
-                <h1>Python App Temporarily Unavailable</h1>
-                <p>The compute service is starting up or temporarily unavailable.</p>
-                <p>Please try again in a few moments.</p>
-                <a href="/" class="btn">← Back to Gateway</a>
-                <a href="/status" class="btn">Check Status</a>
-            </div>
-        </body>
-        </html>
-        """), 503
+        return Response(UNAVAILABLE_HTML, status=503, mimetype='text/html')
 
 @app.route('/shell')
 @app.route('/shell/<path:path>')
@@ -226,48 +458,109 @@ def shell_access(path=''):
         # Route through API service for security
         target_url = f"{API_ENDPOINT}/shell/{path}" if path else f"{API_ENDPOINT}/shell"
         
-        resp = requests.get(
-            target_url, 
+        resp = call_upstream(
+            API_BREAKER, API_BULKHEAD,
+            'GET',
+            target_url,
             params=request.args,
             headers={'X-Forwarded-From': 'entry-service'},
-            timeout=30
+            timeout=SHELL_TIMEOUT,
+            stream=True
         )
         
-        return resp.content, resp.status_code, resp.headers.items()
+        return proxy_response(resp)
         
     except requests.RequestException as e:
-        return jsonify({'error': f'Shell service unavailable: {str(e)}'}), 503
+        return ojson({'error': f'Shell service unavailable: {str(e)}'}), 503
+
+# Last successful health payload per upstream as (monotonic time, payload). Entries
+# younger than STATUS_CACHE_TTL are served without probing; when a probe fails, entries
+# up to STATUS_MAX_STALE old are served marked as stale instead of an error
+STATUS_CACHE = {}
+STATUS_CACHE_LOCK = threading.Lock()
+STATUS_CACHE_TTL = 2.0
+STATUS_MAX_STALE = 60.0
+
+# Runs the per-upstream health probes of /api/status side by side; sized above the
+# two probes per request so overlapping callers and cache refreshes do not queue
+PROBE_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix='health-probe')
+
+# Probes currently running, by URL, so concurrent /api/status callers share one
+INFLIGHT_PROBES = {}
+INFLIGHT_LOCK = threading.Lock()
+
+def probe_health(breaker, bulkhead, url):
+    """Health payload of an upstream service, falling back to its last known status"""
+    with STATUS_CACHE_LOCK:
+        cached = STATUS_CACHE.get(breaker.name)
+    if cached and time.monotonic() - cached[0] < STATUS_CACHE_TTL:
+        return cached[1]
+    
+    try:
+        payload = orjson.loads(call_upstream(breaker, bulkhead, 'GET', url, timeout=HEALTH_TIMEOUT).content)
+    except Exception:
+        if cached and time.monotonic() - cached[0] < STATUS_MAX_STALE:
+            return {**cached[1], 'stale': True}
+        return {'status': 'error', 'error': 'unreachable'}
+    
+    with STATUS_CACHE_LOCK:
+        STATUS_CACHE[breaker.name] = (time.monotonic(), payload)
+    return payload
+
+# (monotonic time, formatted timestamp) of the last now_iso() refresh
+TIMESTAMP_CACHE = (float('-inf'), '')
+
+def now_iso():
+    """Current time in ISO format, refreshed at most once a second"""
+    global TIMESTAMP_CACHE
+    stamped_at, formatted = TIMESTAMP_CACHE
+    now = time.monotonic()
+    if now - stamped_at >= 1.0:
+        formatted = datetime.now().isoformat()
+        TIMESTAMP_CACHE = (now, formatted)
+    return formatted
+
+def submit_probe(breaker, bulkhead, url):
+    """Future for an upstream health probe, joining the one already in flight if any"""
+    with INFLIGHT_LOCK:
+        future = INFLIGHT_PROBES.get(url)
+        started = future is None
+        if started:
+            future = PROBE_POOL.submit(probe_health, breaker, bulkhead, url)
+            INFLIGHT_PROBES[url] = future
+    if started:
+        # Registered outside the lock: it runs inline if the probe already finished
+        future.add_done_callback(lambda done: forget_probe(url, done))
+    return future
+
+def forget_probe(url, future):
+    with INFLIGHT_LOCK:
+        if INFLIGHT_PROBES.get(url) is future:
+            del INFLIGHT_PROBES[url]
 
 @app.route('/api/status')
 def api_status():
     """Get system status from all services"""
     status = {
-        'gateway': {'status': 'ok', 'service': 'entry'},
+        'gateway': {
+            'status': 'ok',
+            'service': 'entry',
+            'latency_p95_ms': {'api': latency_p95('api'), 'compute': latency_p95('compute')}
+        },
         'api': {'status': 'unknown'},
         'compute': {'status': 'unknown'},
-        'timestamp': datetime.now().isoformat()
+        'timestamp': now_iso()
     }
     
-    # Check API service
-    try:
-        resp = requests.get(f"{API_ENDPOINT}/health", timeout=5)
-        status['api'] = resp.json()
-    except:
-        status['api'] = {'status': 'error', 'error': 'unreachable'}
-    
-    # Check compute service
-    try:
-        resp = requests.get(f"{COMPUTE_ENDPOINT}/health", timeout=5)
-        status['compute'] = resp.json()
-    except:
-        status['compute'] = {'status': 'error', 'error': 'unreachable'}
+    # Check API and compute services concurrently, sharing probes with other callers
+    api_probe = submit_probe(API_BREAKER, API_BULKHEAD, f"{API_ENDPOINT}/health")
+    compute_probe = submit_probe(COMPUTE_BREAKER, COMPUTE_BULKHEAD, f"{COMPUTE_ENDPOINT}/health")
+    status['api'] = api_probe.result()
+    status['compute'] = compute_probe.result()
     
-    return jsonify(status)
+    return ojson(status)
 
-@app.route('/status')
-def system_status():
-    """System status dashboard"""
-    return render_template_string("""
+STATUS_PAGE = """
     <!DOCTYPE html>
     <html>
     <head>
@@ -408,7 +701,63 @@ def system_status():
         </script>
     </body>
     </html>
-    """, api_endpoint=API_ENDPOINT, compute_endpoint=COMPUTE_ENDPOINT)
+    """
+
+# Compiled once; /configure only re-renders it
+STATUS_TEMPLATE = app.jinja_env.from_string(STATUS_PAGE)
+
+def render_status_page():
+    """Render the status dashboard and its ETag for the currently configured endpoints"""
+    html = STATUS_TEMPLATE.render(
+        api_endpoint=API_ENDPOINT, compute_endpoint=COMPUTE_ENDPOINT)
+    return html, page_etag(html)
+
+# Only changes on /configure, so it is rendered once per endpoint change.
+# Kept as one tuple so a concurrent /configure never pairs a body with a stale ETag.
+STATUS_HTML = render_status_page()
+
+@app.route('/status')
+def system_status():
+    """System status dashboard"""
+    html, etag = STATUS_HTML
+    return cached_page(html, etag, no_cache=True)
+
+class FastPath:
+    """WSGI middleware answering GETs for constant responses before Flask routing
+
+    routes maps a path to (body, headers, etag); a matching If-None-Match gets a
+    bare 304. Everything else, including HEAD, falls through to the Flask app.
+    """
+
+    def __init__(self, wsgi_app, routes):
+        self.wsgi_app = wsgi_app
+        self.routes = routes
+
+    def __call__(self, environ, start_response):
+        route = self.routes.get(environ.get('PATH_INFO')) if environ.get('REQUEST_METHOD') == 'GET' else None
+        if route is None:
+            return self.wsgi_app(environ, start_response)
+        body, headers, etag = route
+        if etag and parse_etags(environ.get('HTTP_IF_NONE_MATCH')).contains_weak(etag):
+            start_response('304 Not Modified', [h for h in headers if h[0] in ('ETag', 'Cache-Control')])
+            return []
+        start_response('200 OK', headers)
+        return [body]
+
+def fast_route(body, content_type, etag=None, cache_control=None):
+    """Pre-built FastPath entry for a constant body"""
+    headers = [('Content-Type', content_type), ('Content-Length', str(len(body)))]
+    if etag:
+        headers.append(('ETag', quote_etag(etag)))
+    if cache_control:
+        headers.append(('Cache-Control', cache_control))
+    return body, headers, etag
+
+# /status is left to Flask since /configure re-renders it
+app.wsgi_app = FastPath(app.wsgi_app, {
+    '/health': fast_route(HEALTH_BODY, 'application/json'),
+    '/': fast_route(INDEX_HTML.encode('utf-8'), 'text/html; charset=utf-8', INDEX_ETAG, 'max-age=300'),
+})
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 8082))
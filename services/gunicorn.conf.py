@@ -0,0 +1,24 @@
+# Gunicorn settings for the gateway services
+# Usage: gunicorn -c gunicorn.conf.py entry-service:app
+import multiprocessing
+import os
+
+# Cloud Run sets PORT; locally the entry service listens on 8082 (see test-local.sh),
+# next to the compute service on 8080
+bind = f"0.0.0.0:{os.environ.get('PORT', '8082')}"
+
+# The gateway spends nearly all of its time waiting on upstream sockets, so each
+# worker runs a thread pool instead of serving one request at a time. The shared
+# requests session, circuit breakers and bulkhead semaphores are thread-safe.
+# gevent workers are avoided: monkey-patching does not play well with the
+# grpc-based Google Cloud clients.
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+
+keepalive = 30
+timeout = 60
+graceful_timeout = 30
+
+accesslog = '-'
+errorlog = '-'
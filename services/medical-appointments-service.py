@@ -523,10 +523,17 @@ def reserve_appointment():
         return jsonify({'error': 'Appointment already reserved'}), 409
     
     try:
-        schedule.reserved = True
-        schedule.reserved_by = reserved_by
-        schedule.reserved_note = reserved_note
-        schedule.updated_at = datetime.utcnow()
+        # Claim the slot with a conditional UPDATE so two concurrent requests
+        # cannot both pass the reserved check above
+        claimed = Schedule.query.filter_by(id=schedule_id, reserved=False).update({
+            'reserved': True,
+            'reserved_by': reserved_by,
+            'reserved_note': reserved_note,
+            'updated_at': datetime.utcnow()
+        })
+        if not claimed:
+            db.session.rollback()
+            return jsonify({'error': 'Appointment already reserved'}), 409
         
         db.session.commit()
         
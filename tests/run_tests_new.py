@@ -6,9 +6,13 @@ Runs comprehensive tests for the Firebase-only medical appointments system
 import os
 import sys
 import subprocess
+import traceback
 import unittest
-import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from runner_support import iter_tests, pooled_session, thread_session, wait_ready
+
+SESSION = pooled_session()
 
 def check_app_availability():
     """Check if the app is running locally or on instance"""
@@ -19,7 +23,7 @@ def check_app_availability():
     
     # Test local
     try:
-        response = requests.get(f"{local_url}/health", timeout=5)
+        response = SESSION.get(f"{local_url}/health", timeout=5)
         if response.status_code == 200:
             print(f"✅ Local app available at {local_url}")
             return local_url
@@ -29,7 +33,7 @@ def check_app_availability():
     # Test instance if provided
     if instance_url:
         try:
-            response = requests.get(f"{instance_url}/health", timeout=10)
+            response = SESSION.get(f"{instance_url}/health", timeout=10)
             if response.status_code == 200:
                 print(f"✅ Instance app available at {instance_url}")
                 return instance_url
@@ -54,34 +58,84 @@ def run_local_app():
         env['PORT'] = '8080'
         env['TESTING'] = 'true'
         
-        # Start the app in background
+        # Start the app in background. Output is discarded rather than piped: an
+        # undrained pipe blocks the app once its buffer fills. Its own session keeps
+        # a Ctrl+C aimed at the runner from killing it mid-test.
         process = subprocess.Popen(
             [sys.executable, app_path],
             cwd=os.path.dirname(app_path),
             env=env,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True
         )
         
-        # Wait a moment for startup
-        import time
-        time.sleep(3)
+        # Return as soon as the app answers its health check
+        if wait_ready("http://localhost:8080", process=process, session=SESSION):
+            print("✅ Local app started successfully")
+            return process
         
-        # Check if it's running
-        try:
-            response = requests.get("http://localhost:8080/health", timeout=5)
-            if response.status_code == 200:
-                print("✅ Local app started successfully")
-                return process
-        except:
-            process.terminate()
-            print("❌ Failed to start local app")
+        process.terminate()
+        print("❌ Failed to start local app")
     
     except Exception as e:
         print(f"❌ Error starting local app: {e}")
     
     return None
 
+def run_parallel_unittest(suite, workers=8):
+    """Run every test of suite on a thread pool and merge the outcomes into one result
+
+    The tests are independent HTTP round trips, so threads overlap their network
+    waits. Class fixtures run once up front instead of per test, and each worker
+    thread sends its requests through its own pooled session.
+    """
+    tests = list(iter_tests(suite))
+    merged = unittest.TestResult()
+    
+    # Classes whose setUpClass raised are reported per test and never torn down
+    ready_classes = []
+    for test_class in dict.fromkeys(type(test) for test in tests):
+        try:
+            test_class.setUpClass()
+        except unittest.SkipTest as e:
+            merged.skipped.extend((test, str(e)) for test in tests if type(test) is test_class)
+            print(f"{test_class.__name__} ... skipped: {e}")
+        except Exception:
+            error = traceback.format_exc()
+            merged.errors.extend((test, error) for test in tests if type(test) is test_class)
+            merged.testsRun += sum(1 for test in tests if type(test) is test_class)
+            print(f"{test_class.__name__} ... setUpClass ERROR")
+        else:
+            ready_classes.append(test_class)
+    
+    def run_one(test):
+        test._session = thread_session()
+        result = unittest.TestResult()
+        test.run(result)
+        return test, result
+    
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            runnable = [test for test in tests if type(test) in ready_classes]
+            for test, result in executor.map(run_one, runnable):
+                merged.testsRun += result.testsRun
+                merged.failures.extend(result.failures)
+                merged.errors.extend(result.errors)
+                merged.skipped.extend(result.skipped)
+                merged.expectedFailures.extend(result.expectedFailures)
+                merged.unexpectedSuccesses.extend(result.unexpectedSuccesses)
+                outcome = "ok" if result.wasSuccessful() else "FAIL"
+                if result.skipped:
+                    outcome = "skipped"
+                print(f"{test} ... {outcome}")
+    finally:
+        for test_class in ready_classes:
+            test_class.tearDownClass()
+            test_class.doClassCleanups()
+    
+    return merged
+
 def main():
     """Main test runner"""
     print("🏥 Medical Appointments API Test Runner")
@@ -112,15 +166,14 @@ def main():
     
     try:
         # Import and run tests
-        from test_medical_appointments_api import TestMedicalAppointmentsAPI
+        from test_medical_appointments_api_new import TestMedicalAppointmentsAPI
         
         # Create test suite
         loader = unittest.TestLoader()
         suite = loader.loadTestsFromTestCase(TestMedicalAppointmentsAPI)
         
-        # Run tests with detailed output
-        runner = unittest.TextTestRunner(verbosity=2)
-        result = runner.run(suite)
+        # Run tests concurrently; each one is an independent request against the app
+        result = run_parallel_unittest(suite)
         
         # Print summary
         print("\n" + "=" * 60)
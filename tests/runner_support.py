@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Helpers shared by the test runners and the HTTP-based test modules
+"""
+import atexit
+import threading
+import time
+import unittest
+import requests
+from requests.adapters import HTTPAdapter
+
+def pooled_session(pool_connections=16, pool_maxsize=32):
+    """requests Session reusing TCP/TLS connections, closed when the interpreter exits"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    atexit.register(session.close)
+    return session
+
+# requests.Session is not documented as thread-safe, so parallel workers get their own
+_THREAD_SESSIONS = threading.local()
+
+def thread_session():
+    """Pooled session private to the calling thread"""
+    session = getattr(_THREAD_SESSIONS, 'session', None)
+    if session is None:
+        session = _THREAD_SESSIONS.session = pooled_session(pool_connections=4, pool_maxsize=4)
+    return session
+
+def iter_tests(suite):
+    """Flatten a (possibly nested) test suite into its individual test cases"""
+    for test in suite:
+        if isinstance(test, unittest.TestSuite):
+            yield from iter_tests(test)
+        else:
+            yield test
+
+def wait_ready(base_url, deadline=15.0, initial=0.05, process=None, session=None):
+    """Poll base_url/health with growing delays until it answers 200 or deadline passes"""
+    http = session or requests
+    delay = initial
+    start = time.monotonic()
+    while time.monotonic() - start < deadline:
+        if process is not None and process.poll() is not None:
+            return False
+        try:
+            if http.get(f"{base_url}/health", timeout=0.5).status_code == 200:
+                return True
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(delay)
+        delay = min(delay * 1.7, 0.5)
+    return False
@@ -9,6 +9,9 @@ import sys
 import os
 import requests
 from datetime import datetime
+from runner_support import pooled_session
+
+SESSION = pooled_session()
 
 class TestMedicalAppointmentsAPI(unittest.TestCase):
     """Test suite for Medical Appointments API with Firebase backend"""
@@ -19,11 +22,24 @@ class TestMedicalAppointmentsAPI(unittest.TestCase):
         # Test URLs - can be localhost or actual instance
         cls.base_url = os.environ.get('TEST_BASE_URL', 'http://localhost:8080')
         cls.instance_url = os.environ.get('INSTANCE_URL', None)
+        # Shared pooled session; run_parallel_unittest gives each worker thread its own
+        cls._session = SESSION
         
         print(f"🧪 Testing Medical Appointments API")
         print(f"📍 Base URL: {cls.base_url}")
         if cls.instance_url:
             print(f"🌐 Instance URL: {cls.instance_url}")
+        
+        # Import the app once per class; importing it initializes Flask and Firebase
+        app_dir = os.path.join(os.path.dirname(__file__), '..', 'apps', 'medical-appointments')
+        if app_dir not in sys.path:
+            sys.path.insert(0, app_dir)
+        try:
+            import app as app_module
+            cls.app_module = app_module
+        except ImportError as e:
+            print(f"⚠️ Direct import failed (expected in instance): {e}")
+            cls.app_module = None
     
     def setUp(self):
         """Set up each test"""
@@ -31,18 +47,15 @@ class TestMedicalAppointmentsAPI(unittest.TestCase):
         
     def test_direct_import(self):
         """Test importing the app directly"""
-        try:
-            sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'apps', 'medical-appointments'))
-            import app
-            self.assertIsNotNone(app.app)
-            print("✅ Direct app import: SUCCESS")
-        except ImportError as e:
-            print(f"⚠️ Direct import failed (expected in instance): {e}")
+        if self.app_module is None:
+            self.skipTest("App not importable (expected in instance)")
+        self.assertIsNotNone(self.app_module.app)
+        print("✅ Direct app import: SUCCESS")
             
     def test_health_endpoint(self):
         """Test health check endpoint"""
         try:
-            response = requests.get(f"{self.base_url}/health", timeout=10)
+            response = self._session.get(f"{self.base_url}/health", timeout=10)
             self.assertEqual(response.status_code, 200)
             data = response.json()
             self.assertIn('status', data)
@@ -55,7 +68,7 @@ class TestMedicalAppointmentsAPI(unittest.TestCase):
     def test_api_health_endpoint(self):
         """Test API health check endpoint"""
         try:
-            response = requests.get(f"{self.base_url}/api/health", timeout=10)
+            response = self._session.get(f"{self.base_url}/api/health", timeout=10)
             self.assertEqual(response.status_code, 200)
             data = response.json()
             self.assertIn('status', data)
@@ -69,7 +82,7 @@ class TestMedicalAppointmentsAPI(unittest.TestCase):
     def test_appointments_get(self):
         """Test GET appointments endpoint"""
         try:
-            response = requests.get(f"{self.base_url}/api/appointments", timeout=10)
+            response = self._session.get(f"{self.base_url}/api/appointments", timeout=10)
             self.assertEqual(response.status_code, 200)
             data = response.json()
             self.assertIn('success', data)
@@ -89,7 +102,7 @@ class TestMedicalAppointmentsAPI(unittest.TestCase):
         }
         
         try:
-            response = requests.post(
+            response = self._session.post(
                 f"{self.base_url}/api/appointments", 
                 json=appointment_data,
                 headers=self.headers,
@@ -106,7 +119,7 @@ class TestMedicalAppointmentsAPI(unittest.TestCase):
     def test_patients_endpoint(self):
         """Test patients endpoint"""
         try:
-            response = requests.get(f"{self.base_url}/api/patients", timeout=10)
+            response = self._session.get(f"{self.base_url}/api/patients", timeout=10)
             self.assertEqual(response.status_code, 200)
             data = response.json()
             self.assertIn('success', data)
@@ -118,7 +131,7 @@ class TestMedicalAppointmentsAPI(unittest.TestCase):
     def test_doctors_endpoint(self):
         """Test doctors endpoint"""
         try:
-            response = requests.get(f"{self.base_url}/api/doctors", timeout=10)
+            response = self._session.get(f"{self.base_url}/api/doctors", timeout=10)
             self.assertEqual(response.status_code, 200)
             data = response.json()
             self.assertIn('success', data)
@@ -130,7 +143,7 @@ class TestMedicalAppointmentsAPI(unittest.TestCase):
     def test_language_endpoint(self):
         """Test language endpoint (this was previously failing)"""
         try:
-            response = requests.get(f"{self.base_url}/api/lang", timeout=10)
+            response = self._session.get(f"{self.base_url}/api/lang", timeout=10)
             self.assertEqual(response.status_code, 200)
             data = response.json()
             self.assertIn('supported_languages', data)
@@ -143,7 +156,7 @@ class TestMedicalAppointmentsAPI(unittest.TestCase):
     def test_main_app_page(self):
         """Test main application page"""
         try:
-            response = requests.get(f"{self.base_url}/medical-appointments/", timeout=10)
+            response = self._session.get(f"{self.base_url}/medical-appointments/", timeout=10)
             self.assertEqual(response.status_code, 200)
             self.assertIn('Medical Appointments API', response.text)
             print("✅ Main app page: SUCCESS")
@@ -154,7 +167,7 @@ class TestMedicalAppointmentsAPI(unittest.TestCase):
     def test_home_page(self):
         """Test home page"""
         try:
-            response = requests.get(f"{self.base_url}/", timeout=10)
+            response = self._session.get(f"{self.base_url}/", timeout=10)
             self.assertEqual(response.status_code, 200)
             self.assertIn('Medical Appointments', response.text)
             print("✅ Home page: SUCCESS")
@@ -180,13 +193,29 @@ class TestMedicalAppointmentsAPI(unittest.TestCase):
             '/medical-appointments/'
         ]
         
-        for endpoint in endpoints_to_test:
+        import asyncio
+        import aiohttp
+        
+        async def probe(session, endpoint):
             try:
-                response = requests.get(f"{self.instance_url}{endpoint}", timeout=15)
-                self.assertIn(response.status_code, [200, 201])
-                print(f"✅ Instance {endpoint}: SUCCESS")
-            except requests.exceptions.RequestException as e:
-                print(f"❌ Instance {endpoint} failed: {e}")
+                async with session.get(f"{self.instance_url}{endpoint}") as response:
+                    return endpoint, response.status, None
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                return endpoint, None, e
+        
+        async def probe_all():
+            # The checks are independent, so all endpoints are requested at once
+            connector = aiohttp.TCPConnector(limit=len(endpoints_to_test))
+            timeout = aiohttp.ClientTimeout(total=15)
+            async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+                return await asyncio.gather(*(probe(session, endpoint) for endpoint in endpoints_to_test))
+        
+        for endpoint, status_code, error in asyncio.run(probe_all()):
+            if error is not None:
+                print(f"❌ Instance {endpoint} failed: {str(error) or type(error).__name__}")
+                continue
+            self.assertIn(status_code, [200, 201])
+            print(f"✅ Instance {endpoint}: SUCCESS")
     
     def test_firebase_functionality(self):
         """Test Firebase-specific functionality"""
@@ -198,7 +227,7 @@ class TestMedicalAppointmentsAPI(unittest.TestCase):
         
         try:
             # Create a patient
-            response = requests.post(
+            response = self._session.post(
                 f"{self.base_url}/api/patients",
                 json=patient_data,
                 headers=self.headers,
@@ -207,7 +236,7 @@ class TestMedicalAppointmentsAPI(unittest.TestCase):
             
             if response.status_code == 201:
                 # Try to get patients list
-                get_response = requests.get(f"{self.base_url}/api/patients", timeout=10)
+                get_response = self._session.get(f"{self.base_url}/api/patients", timeout=10)
                 self.assertEqual(get_response.status_code, 200)
                 print("✅ Firebase functionality test: SUCCESS")
             else:
@@ -2,71 +2,247 @@
 """
 Comprehensive Test Suite for Medical Appointments API
 Tests all endpoints, Firebase integration, and health checks
+
+Safe to run in parallel worker processes:
+    pytest tests/test_medical_appointments_api_old.py -n auto --dist=loadfile
+
+The heavier flow/bulk/concurrency tests only run with RUN_INTEGRATION=1.
 """
 import unittest
+import functools
+import hashlib
+import importlib.util
 import json
 import sys
 import os
+import tempfile
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
 from datetime import datetime, date, time
 from unittest.mock import patch, MagicMock
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.orm import scoped_session, sessionmaker
+from werkzeug.serving import make_server
+from werkzeug.wrappers import Request, Response
 
 # Add the apps directory to the path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'apps', 'medical-appointments'))
 
+# Request payloads shared by several tests (never mutated)
+CONFIG_DATA = {
+    'auto_scale': True,
+    'storage_bucket': 'test-bucket',
+    'database': 'firestore'
+}
+
+DEPLOY_DATA = {
+    'auto_scale': True,
+    'storage_bucket': 'medical-appointments-bucket',
+    'database': 'integrated_sql_firestore'
+}
+
+VALID_SCHEDULE = {'date': '2025-12-15', 'hour': '14:30', 'shared': True}
+INVALID_DATE_SCHEDULE = {'date': 'invalid-date', 'hour': '14:30', 'shared': True}
+EARLY_HOUR_SCHEDULE = {'date': '2025-12-15', 'hour': '08:30', 'shared': True}  # Before 09:00
+LATE_HOUR_SCHEDULE = {'date': '2025-12-15', 'hour': '20:30', 'shared': True}  # After 19:00
+INVALID_SCHEDULES = (INVALID_DATE_SCHEDULE, EARLY_HOUR_SCHEDULE, LATE_HOUR_SCHEDULE)
+
+# (path, payload, expected status) and (language, expected message fragment)
+CONFIGURATION_CASES = (
+    ('/configure', CONFIG_DATA, 'configured'),
+    ('/deploy', DEPLOY_DATA, 'deployed'),
+)
+LOCALIZED_DATE_ERRORS = (
+    ('en', 'Invalid date format'),
+    ('es', 'inválido'),
+)
+
+# Multi-request flows and load tests are opt-in; the default run stays unit-fast
+integration = unittest.skipUnless(os.environ.get('RUN_INTEGRATION'), 'integration only; set RUN_INTEGRATION=1')
+
+# Recorded responses for the live-instance tests, keyed by request hash
+HTTP_MOCKS_DIR = os.path.join(os.path.dirname(__file__), 'fixtures', 'http_mocks')
+
+
+class RecordReplayAdapter(HTTPAdapter):
+    """Serve live-instance requests from recorded fixtures.
+
+    USE_MOCK_PROVIDER=true replays from HTTP_MOCKS_DIR without touching the
+    network; RECORD_HTTP_MOCKS=true forwards requests and saves responses.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.replay = os.environ.get('USE_MOCK_PROVIDER', '').lower() == 'true'
+        self.record = os.environ.get('RECORD_HTTP_MOCKS', '').lower() == 'true'
+
+    @staticmethod
+    def fixture_path(request):
+        # Headers are left out: User-Agent changes with the requests version
+        body = request.body or b''
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        digest = hashlib.sha256(request.method.encode() + b' ' + request.url.encode() + b'\n' + body)
+        return os.path.join(HTTP_MOCKS_DIR, f'{digest.hexdigest()}.json')
+
+    def send(self, request, **kwargs):
+        path = self.fixture_path(request)
+        if self.replay:
+            try:
+                with open(path, encoding='utf-8') as f:
+                    recorded = json.load(f)
+            except FileNotFoundError:
+                raise requests.ConnectionError(f'No recorded response for {request.method} {request.url}')
+            response = requests.Response()
+            response.status_code = recorded['status']
+            response.headers = CaseInsensitiveDict(recorded['headers'])
+            response._content = recorded['body'].encode('utf-8')
+            response.encoding = 'utf-8'
+            response.url = request.url
+            response.request = request
+            return response
+
+        response = super().send(request, **kwargs)
+        if self.record:
+            os.makedirs(HTTP_MOCKS_DIR, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'status': response.status_code,
+                    'headers': {'Content-Type': response.headers.get('Content-Type', '')},
+                    'body': response.text
+                }, f, indent=2)
+        return response
+
+
+# One pooled, record/replay-aware session for every live-instance request
+SESSION = requests.Session()
+SESSION.mount('http://', RecordReplayAdapter(pool_connections=10, pool_maxsize=10))
+SESSION.mount('https://', RecordReplayAdapter(pool_connections=10, pool_maxsize=10))
+
+# Shared by every test class; reset per test, never rebuilt
+MOCK_FIRESTORE = MagicMock()
+MOCK_STORAGE = MagicMock()
+
+
+@functools.lru_cache(maxsize=None)
+def load_service():
+    """Import the service and build its test database once per process.
+
+    Call with the GCP clients already patched; the service creates them at
+    import time.
+    """
+    os.environ['TESTING'] = 'true'
+    os.environ['GOOGLE_CLOUD_PROJECT'] = 'test-project'
+    
+    # The service builds its engine from DATABASE_URL at import time. A plain
+    # in-memory URL keeps that throwaway engine on Flask-SQLAlchemy's own
+    # StaticPool defaults; the test engine is swapped in below.
+    os.environ['DATABASE_URL'] = 'sqlite://'
+    
+    # Import the service straight from its file: no sys.path or cwd changes
+    service_path = os.path.join(os.path.dirname(__file__), '..', 'services',
+                                'medical-appointments-service.py')
+    spec = importlib.util.spec_from_file_location('medical_appointments_service', service_path)
+    medical_appointments_service = importlib.util.module_from_spec(spec)
+    sys.modules['medical_appointments_service'] = medical_appointments_service
+    spec.loader.exec_module(medical_appointments_service)
+    
+    app, db = medical_appointments_service.app, medical_appointments_service.db
+    app.config['TESTING'] = True
+    
+    # One shared connection to a per-process named in-memory database, so every
+    # test (and worker thread) hits the same data and its warm page cache. The
+    # absolute-looking name keeps it distinct per pytest-xdist worker.
+    with app.app_context():
+        import_engine = db.engine
+        engine = create_engine(
+            f'sqlite:///file:/medtest_{os.getpid()}?mode=memory&cache=shared&uri=true'
+            '&check_same_thread=false',
+            poolclass=StaticPool
+        )
+        db.engines[None] = engine
+    import_engine.dispose()
+    
+    # pysqlite defers BEGIN until the first write, which would let a
+    # SAVEPOINT open (and RELEASE commit) its own transaction; turn that
+    # off so statements autocommit unless a test begins explicitly. The
+    # database is throwaway, so journaling and syncing are pure overhead.
+    @event.listens_for(engine, 'connect')
+    def _configure_test_connection(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=MEMORY')
+        cursor.execute('PRAGMA synchronous=OFF')
+        cursor.execute('PRAGMA temp_store=MEMORY')
+        cursor.close()
+    
+    with app.app_context():
+        db.create_all()
+    
+    return medical_appointments_service
+
+
 class TestMedicalAppointmentsAPI(unittest.TestCase):
     """Test suite for Medical Appointments API"""
     
     @classmethod
     def setUpClass(cls):
         """Set up test environment"""
-        # Mock Firebase for testing
-        cls.mock_firestore = MagicMock()
-        
-        # Set test environment variables
-        os.environ['TESTING'] = 'true'
-        os.environ['GOOGLE_CLOUD_PROJECT'] = 'test-project'
-        
         # Test URLs - can be localhost or actual instance
         cls.base_url = os.environ.get('TEST_BASE_URL', 'http://localhost:8080')
         cls.instance_url = os.environ.get('INSTANCE_URL', None)
         
+        # Mock Firebase for testing
+        cls.mock_firestore = MOCK_FIRESTORE
+        cls.mock_storage = MOCK_STORAGE
+        
+        # GCP clients stay patched for the whole class rather than per test
+        cls._firestore_patch = patch('google.cloud.firestore.Client', return_value=cls.mock_firestore)
+        cls._storage_patch = patch('google.cloud.storage.Client', return_value=cls.mock_storage)
+        cls._firestore_patch.start()
+        cls._storage_patch.start()
+        cls.addClassCleanup(patch.stopall)
+        
+        cls.service = load_service()
+        cls.app = cls.service.app
+        cls.db = cls.service.db
+        cls.client = cls.app.test_client()
+        with cls.app.app_context():
+            cls.engine = cls.db.engine
+        
+        # Tests swap in a rolled-back session; keep the service's own to restore
+        cls.app_session = cls.db.session
+    
+    @classmethod
+    def tearDownClass(cls):
+        """Give the service back its own session"""
+        cls.db.session = cls.app_session
+        
     def setUp(self):
         """Set up each test"""
-        with patch('google.cloud.firestore.Client', return_value=self.mock_firestore), \
-             patch('google.cloud.storage.Client', return_value=self.mock_storage):
-            
-            # Import and create app after mocking GCP services
-            # Import medical_appointments_service with proper path handling
-            import sys
-            import os
-            services_dir = os.path.join(os.path.dirname(__file__), '..', 'services')
-            if services_dir not in sys.path:
-                sys.path.insert(0, services_dir)
-            
-            # Change to services directory temporarily for imports
-            original_cwd = os.getcwd()
-            try:
-                os.chdir(services_dir)
-                import medical_appointments_service
-                self.app = medical_appointments_service.app
-                self.db = medical_appointments_service.db
-            finally:
-                os.chdir(original_cwd)
-            
-            self.app.config['TESTING'] = True
-            self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-            self.client = self.app.test_client()
-            
-            with self.app.app_context():
-                db.create_all()
+        # Call counts never leak between tests
+        self.mock_firestore.reset_mock()
+        self.mock_storage.reset_mock()
+        
+        # The service commits freely; bind its session to an outer transaction
+        # so those commits only release savepoints and tearDown discards them
+        self.connection = self.engine.connect()
+        self.transaction = self.connection.begin()
+        self.connection.exec_driver_sql('BEGIN')
+        self.db.session = scoped_session(sessionmaker(
+            bind=self.connection, join_transaction_mode='create_savepoint'))
     
     def tearDown(self):
         """Clean up after each test"""
         with self.app.app_context():
-            from medical_appointments_service import db
-            db.session.remove()
-            db.drop_all()
+            self.db.session.remove()
+        self.db.session = self.app_session
+        if self.transaction.is_active:
+            self.transaction.rollback()
+        self.connection.close()
 
     # ==== HEALTH CHECK TESTS ====
     
@@ -81,51 +257,21 @@ class TestMedicalAppointmentsAPI(unittest.TestCase):
         self.assertTrue('timestamp' in data)
         self.assertTrue('gcp_available' in data)
     
-    def test_configure_endpoint(self):
-        """Test service configuration for auto-scaling"""
-        config_data = {
-            'auto_scale': True,
-            'storage_bucket': 'test-bucket',
-            'database': 'firestore'
-        }
-        
-        response = self.client.post('/configure',
-                                   data=json.dumps(config_data),
-                                   content_type='application/json')
-        self.assertEqual(response.status_code, 200)
-        
-        data = json.loads(response.data)
-        self.assertEqual(data['status'], 'configured')
-    
-    def test_deploy_endpoint(self):
-        """Test app deployment configuration"""
-        deploy_data = {
-            'auto_scale': True,
-            'storage_bucket': 'medical-appointments-bucket',
-            'database': 'integrated_sql_firestore'
-        }
-        
-        response = self.client.post('/deploy',
-                                   data=json.dumps(deploy_data),
-                                   content_type='application/json')
-        self.assertEqual(response.status_code, 200)
-        
-        data = json.loads(response.data)
-        self.assertEqual(data['status'], 'deployed')
+    def test_configuration_endpoints(self):
+        """Test service configure/deploy endpoints for auto-scaling"""
+        for path, payload, expected_status in CONFIGURATION_CASES:
+            with self.subTest(path=path):
+                response = self.client.post(path, json=payload)
+                self.assertEqual(response.status_code, 200)
+                
+                data = json.loads(response.data)
+                self.assertEqual(data['status'], expected_status)
 
     # ==== SCHEDULE API TESTS ====
     
     def test_create_schedule_success(self):
         """Test successful schedule creation"""
-        schedule_data = {
-            'date': '2025-12-15',
-            'hour': '14:30',
-            'shared': True
-        }
-        
-        response = self.client.post('/api/schedules',
-                                   data=json.dumps(schedule_data),
-                                   content_type='application/json')
+        response = self.client.post('/api/schedules', json=VALID_SCHEDULE)
         self.assertEqual(response.status_code, 201)
         
         data = json.loads(response.data)
@@ -134,50 +280,15 @@ class TestMedicalAppointmentsAPI(unittest.TestCase):
         self.assertEqual(data['schedule']['hour'], '14:30')
         self.assertTrue(data['schedule']['shared'])
     
-    def test_create_schedule_invalid_date(self):
-        """Test schedule creation with invalid date"""
-        schedule_data = {
-            'date': 'invalid-date',
-            'hour': '14:30',
-            'shared': True
-        }
-        
-        response = self.client.post('/api/schedules',
-                                   data=json.dumps(schedule_data),
-                                   content_type='application/json')
-        self.assertEqual(response.status_code, 400)
-        
-        data = json.loads(response.data)
-        self.assertTrue('error' in data)
-    
-    def test_create_schedule_invalid_hour(self):
-        """Test schedule creation with invalid hour"""
-        schedule_data = {
-            'date': '2025-12-15',
-            'hour': '08:30',  # Before 09:00
-            'shared': True
-        }
-        
-        response = self.client.post('/api/schedules',
-                                   data=json.dumps(schedule_data),
-                                   content_type='application/json')
-        self.assertEqual(response.status_code, 400)
-        
-        data = json.loads(response.data)
-        self.assertTrue('error' in data)
-    
-    def test_create_schedule_hour_out_of_range(self):
-        """Test schedule creation with hour outside business hours"""
-        schedule_data = {
-            'date': '2025-12-15',
-            'hour': '20:30',  # After 19:00
-            'shared': True
-        }
-        
-        response = self.client.post('/api/schedules',
-                                   data=json.dumps(schedule_data),
-                                   content_type='application/json')
-        self.assertEqual(response.status_code, 400)
+    def test_create_schedule_invalid_input(self):
+        """Test schedule creation rejects bad dates and out-of-hours slots"""
+        for payload in INVALID_SCHEDULES:
+            with self.subTest(date=payload['date'], hour=payload['hour']):
+                response = self.client.post('/api/schedules', json=payload)
+                self.assertEqual(response.status_code, 400)
+                
+                data = json.loads(response.data)
+                self.assertTrue('error' in data)
     
     def test_get_schedules(self):
         """Test getting all schedules"""
@@ -227,9 +338,7 @@ class TestMedicalAppointmentsAPI(unittest.TestCase):
         schedule_id = self._create_test_schedule('2025-12-15', '10:00', False)
         
         update_data = {'shared': True}
-        response = self.client.put(f'/api/schedules/{schedule_id}',
-                                  data=json.dumps(update_data),
-                                  content_type='application/json')
+        response = self.client.put(f'/api/schedules/{schedule_id}', json=update_data)
         self.assertEqual(response.status_code, 200)
         
         data = json.loads(response.data)
@@ -258,9 +367,7 @@ class TestMedicalAppointmentsAPI(unittest.TestCase):
             'reserved_note': 'Regular checkup'
         }
         
-        response = self.client.post('/api/appointments/reserve',
-                                   data=json.dumps(reservation_data),
-                                   content_type='application/json')
+        response = self.client.post('/api/appointments/reserve', json=reservation_data)
         self.assertEqual(response.status_code, 200)
         
         data = json.loads(response.data)
@@ -277,17 +384,31 @@ class TestMedicalAppointmentsAPI(unittest.TestCase):
             'reserved_by': 'John Doe',
             'reserved_note': 'First reservation'
         }
-        self.client.post('/api/appointments/reserve',
-                        data=json.dumps(reservation_data),
-                        content_type='application/json')
+        self.client.post('/api/appointments/reserve', json=reservation_data)
         
         # Try to reserve again
         reservation_data['reserved_by'] = 'Jane Doe'
-        response = self.client.post('/api/appointments/reserve',
-                                   data=json.dumps(reservation_data),
-                                   content_type='application/json')
+        response = self.client.post('/api/appointments/reserve', json=reservation_data)
         self.assertEqual(response.status_code, 409)
     
+    def test_reserve_lost_race(self):
+        """Test a reservation whose availability check is overtaken by another booking"""
+        schedule_id = self._create_test_schedule('2025-12-15', '10:00', True)
+        self.client.post('/api/appointments/reserve',
+                         json={'schedule_id': schedule_id, 'reserved_by': 'John Doe'})
+        
+        # The handler sees a stale, still-free slot, as if the rival request
+        # committed between its check and its claim
+        stale = self.service.Schedule(id=schedule_id, reserved=False)
+        with patch.object(self.service.Schedule.query_class, 'get_or_404', return_value=stale):
+            response = self.client.post('/api/appointments/reserve',
+                                        json={'schedule_id': schedule_id, 'reserved_by': 'Jane Doe'})
+        self.assertEqual(response.status_code, 409)
+        
+        response = self.client.get(f'/api/schedules/{schedule_id}')
+        data = json.loads(response.data)
+        self.assertEqual(data['schedule']['reserved_by'], 'John Doe')
+    
     def test_cancel_appointment(self):
         """Test cancelling an appointment"""
         schedule_id = self._create_test_schedule('2025-12-15', '10:00', True)
@@ -298,15 +419,11 @@ class TestMedicalAppointmentsAPI(unittest.TestCase):
             'reserved_by': 'John Doe',
             'reserved_note': 'Regular checkup'
         }
-        self.client.post('/api/appointments/reserve',
-                        data=json.dumps(reservation_data),
-                        content_type='application/json')
+        self.client.post('/api/appointments/reserve', json=reservation_data)
         
         # Cancel the appointment
         cancel_data = {'schedule_id': schedule_id}
-        response = self.client.post('/api/appointments/cancel',
-                                   data=json.dumps(cancel_data),
-                                   content_type='application/json')
+        response = self.client.post('/api/appointments/cancel', json=cancel_data)
         self.assertEqual(response.status_code, 200)
         
         # Verify it's cancelled
@@ -319,44 +436,21 @@ class TestMedicalAppointmentsAPI(unittest.TestCase):
         schedule_id = self._create_test_schedule('2025-12-15', '10:00', True)
         
         cancel_data = {'schedule_id': schedule_id}
-        response = self.client.post('/api/appointments/cancel',
-                                   data=json.dumps(cancel_data),
-                                   content_type='application/json')
+        response = self.client.post('/api/appointments/cancel', json=cancel_data)
         self.assertEqual(response.status_code, 400)
 
     # ==== MULTILINGUAL TESTS ====
     
-    def test_multilingual_responses_english(self):
-        """Test English language responses"""
-        schedule_data = {
-            'date': 'invalid-date',
-            'hour': '14:30',
-            'shared': True
-        }
-        
-        response = self.client.post('/api/schedules',
-                                   data=json.dumps(schedule_data),
-                                   content_type='application/json',
-                                   headers={'Accept-Language': 'en'})
-        
-        data = json.loads(response.data)
-        self.assertIn('Invalid date format', data['error'])
-    
-    def test_multilingual_responses_spanish(self):
-        """Test Spanish language responses"""
-        schedule_data = {
-            'date': 'invalid-date',
-            'hour': '14:30',
-            'shared': True
-        }
-        
-        response = self.client.post('/api/schedules',
-                                   data=json.dumps(schedule_data),
-                                   content_type='application/json',
-                                   headers={'Accept-Language': 'es'})
-        
-        data = json.loads(response.data)
-        self.assertIn('inválido', data['error'].lower())
+    def test_multilingual_responses(self):
+        """Test error messages follow Accept-Language"""
+        for lang, expected in LOCALIZED_DATE_ERRORS:
+            with self.subTest(lang=lang):
+                response = self.client.post('/api/schedules',
+                                           json=INVALID_DATE_SCHEDULE,
+                                           headers={'Accept-Language': lang})
+                
+                data = json.loads(response.data)
+                self.assertIn(expected, data['error'])
 
     # ==== WEB INTERFACE TESTS ====
     
@@ -386,6 +480,7 @@ class TestMedicalAppointmentsAPI(unittest.TestCase):
 
     # ==== INTEGRATION TESTS ====
     
+    @integration
     def test_end_to_end_appointment_flow(self):
         """Test complete appointment booking flow"""
         # 1. Create a schedule
@@ -394,9 +489,7 @@ class TestMedicalAppointmentsAPI(unittest.TestCase):
             'hour': '14:00',
             'shared': True
         }
-        response = self.client.post('/api/schedules',
-                                   data=json.dumps(schedule_data),
-                                   content_type='application/json')
+        response = self.client.post('/api/schedules', json=schedule_data)
         self.assertEqual(response.status_code, 201)
         schedule = json.loads(response.data)['schedule']
         
@@ -411,9 +504,7 @@ class TestMedicalAppointmentsAPI(unittest.TestCase):
             'reserved_by': 'Alice Johnson',
             'reserved_note': 'Annual physical exam'
         }
-        response = self.client.post('/api/appointments/reserve',
-                                   data=json.dumps(reservation_data),
-                                   content_type='application/json')
+        response = self.client.post('/api/appointments/reserve', json=reservation_data)
         self.assertEqual(response.status_code, 200)
         
         # 4. Verify appointment no longer available
@@ -423,9 +514,7 @@ class TestMedicalAppointmentsAPI(unittest.TestCase):
         
         # 5. Cancel the appointment
         cancel_data = {'schedule_id': schedule['id']}
-        response = self.client.post('/api/appointments/cancel',
-                                   data=json.dumps(cancel_data),
-                                   content_type='application/json')
+        response = self.client.post('/api/appointments/cancel', json=cancel_data)
         self.assertEqual(response.status_code, 200)
         
         # 6. Verify appointment available again
@@ -433,44 +522,59 @@ class TestMedicalAppointmentsAPI(unittest.TestCase):
         data = json.loads(response.data)
         self.assertEqual(data['count'], 1)
 
+    @unittest.skipUnless(os.environ.get('INSTANCE_URL'), 'INSTANCE_URL not set')
+    def test_instance_health(self):
+        """Test a deployed instance's health endpoint (recorded or live)"""
+        response = SESSION.get(f'{self.instance_url}/health', timeout=10)
+        self.assertEqual(response.status_code, 200)
+        
+        data = response.json()
+        self.assertEqual(data['status'], 'ok')
+        self.assertEqual(data['service'], 'medical-appointments-api')
+
     # ==== PERFORMANCE & SCALING TESTS ====
     
+    @integration
     def test_bulk_schedule_creation(self):
         """Test creating multiple schedules (load testing)"""
         from datetime import timedelta
         
         base_date = date(2025, 12, 1)
-        schedules_created = 0
-        
-        for day_offset in range(5):  # 5 days
-            for hour in range(9, 18):  # 9 AM to 5 PM
-                schedule_date = base_date + timedelta(days=day_offset)
-                schedule_data = {
-                    'date': schedule_date.strftime('%Y-%m-%d'),
-                    'hour': f'{hour:02d}:00',
-                    'shared': day_offset % 2 == 0  # Alternate shared/private
-                }
-                
-                response = self.client.post('/api/schedules',
-                                           data=json.dumps(schedule_data),
-                                           content_type='application/json')
-                if response.status_code == 201:
-                    schedules_created += 1
+        
+        # One bulk INSERT and one commit for the whole grid; per-request
+        # creation is covered by the schedule API tests above
+        payloads = [
+            {
+                'date': base_date + timedelta(days=day_offset),
+                'hour': time(hour, 0),
+                'shared': day_offset % 2 == 0  # Alternate shared/private
+            }
+            for day_offset in range(5)  # 5 days
+            for hour in range(9, 18)  # 9 AM to 5 PM
+        ]
+        self.db.session.bulk_insert_mappings(self.service.Schedule, payloads)
+        self.db.session.commit()
         
         # Verify all schedules were created
         response = self.client.get('/api/schedules')
         data = json.loads(response.data)
-        self.assertEqual(data['count'], schedules_created)
-        self.assertEqual(schedules_created, 45)  # 5 days * 9 hours
+        self.assertEqual(data['count'], len(payloads))
+        self.assertEqual(data['count'], 45)  # 5 days * 9 hours
     
+    @integration
     def test_concurrent_reservations(self):
         """Test handling concurrent reservation attempts"""
         import threading
-        import time
+        from concurrent.futures import ThreadPoolExecutor
+        
+        # Concurrent requests need real commits: their savepoints on the one
+        # test transaction would unwind each other
+        self._leave_test_transaction()
         
         schedule_id = self._create_test_schedule('2025-12-25', '10:00', True)
         
-        results = []
+        # Every worker waits at the barrier so the five requests really overlap
+        barrier = threading.Barrier(5)
         
         def attempt_reservation(patient_name):
             reservation_data = {
@@ -478,23 +582,14 @@ class TestMedicalAppointmentsAPI(unittest.TestCase):
                 'reserved_by': patient_name,
                 'reserved_note': 'Concurrent test'
             }
-            response = self.client.post('/api/appointments/reserve',
-                                       data=json.dumps(reservation_data),
-                                       content_type='application/json')
-            results.append((patient_name, response.status_code))
+            barrier.wait()
+            response = self.client.post('/api/appointments/reserve', json=reservation_data)
+            return (patient_name, response.status_code)
         
         # Start multiple reservation attempts simultaneously
-        threads = []
-        for i in range(5):
-            thread = threading.Thread(target=attempt_reservation, 
-                                     args=[f'Patient{i}'])
-            threads.append(thread)
-        
-        for thread in threads:
-            thread.start()
-        
-        for thread in threads:
-            thread.join()
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            results = list(executor.map(attempt_reservation,
+                                        [f'Patient{i}' for i in range(5)]))
         
         # Verify only one succeeded
         successful_reservations = [r for r in results if r[1] == 200]
@@ -505,6 +600,19 @@ class TestMedicalAppointmentsAPI(unittest.TestCase):
 
     # ==== HELPER METHODS ====
     
+    def _leave_test_transaction(self):
+        """Run the rest of a test on the service's own, committing session"""
+        self.db.session.remove()
+        self.transaction.rollback()
+        self.db.session = self.app_session
+        self.addCleanup(self._delete_all_schedules)
+    
+    def _delete_all_schedules(self):
+        """Remove rows committed outside the test transaction"""
+        with self.app.app_context():
+            self.service.Schedule.query.delete()
+            self.db.session.commit()
+    
     def _create_test_schedule(self, date_str, hour_str, shared=True):
         """Helper method to create a test schedule"""
         schedule_data = {
@@ -513,9 +621,7 @@ class TestMedicalAppointmentsAPI(unittest.TestCase):
             'shared': shared
         }
         
-        response = self.client.post('/api/schedules',
-                                   data=json.dumps(schedule_data),
-                                   content_type='application/json')
+        response = self.client.post('/api/schedules', json=schedule_data)
         
         if response.status_code == 201:
             return json.loads(response.data)['schedule']['id']
@@ -523,6 +629,88 @@ class TestMedicalAppointmentsAPI(unittest.TestCase):
             raise Exception(f"Failed to create test schedule: {response.data}")
 
 
+def serve_locally(test, wsgi_app):
+    """Serve wsgi_app on an ephemeral localhost port until test finishes; returns its base URL"""
+    server = make_server('127.0.0.1', 0, wsgi_app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    test.addCleanup(server.server_close)
+    test.addCleanup(server.shutdown)
+    return f'http://127.0.0.1:{server.server_port}'
+
+
+@functools.lru_cache(maxsize=None)
+def load_entry_service():
+    """Import the entry (gateway) service once per process"""
+    service_path = os.path.join(os.path.dirname(__file__), '..', 'services', 'entry-service.py')
+    spec = importlib.util.spec_from_file_location('entry_service', service_path)
+    entry_service = importlib.util.module_from_spec(spec)
+    sys.modules['entry_service'] = entry_service
+    spec.loader.exec_module(entry_service)
+    return entry_service
+
+
+class TestEntryServiceUpstream(unittest.TestCase):
+    """Gateway behaviour against a local stand-in for the compute service"""
+    
+    def test_retry_after_is_capped(self):
+        """A large Retry-After must not hold the proxied call past its timeout"""
+        import time
+        
+        @Request.application
+        def busy_upstream(request):
+            return Response('busy', status=503, headers={'Retry-After': '120'})
+        
+        entry_service = load_entry_service()
+        client = entry_service.app.test_client()
+        client.post('/configure', json={'compute_endpoint': serve_locally(self, busy_upstream)})
+        
+        start = time.monotonic()
+        response = client.get('/app/busy')
+        elapsed = time.monotonic() - start
+        
+        self.assertEqual(response.status_code, 503)
+        self.assertLess(elapsed, entry_service.PROXY_TIMEOUT[1])
+        self.assertLessEqual(elapsed, entry_service.UPSTREAM_RETRY.total * entry_service.RETRY_AFTER_MAX + 1.0)
+
+
+class TestRecordReplayAdapter(unittest.TestCase):
+    """Recording live responses and serving them back offline"""
+    
+    def test_record_then_replay(self):
+        hits = []
+        
+        @Request.application
+        def instance(request):
+            hits.append(request.path)
+            return Response('{"status": "healthy"}', mimetype='application/json')
+        
+        url = f"{serve_locally(self, instance)}/health"
+        mocks_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(mocks_dir.cleanup)
+        
+        with patch(f'{__name__}.HTTP_MOCKS_DIR', mocks_dir.name):
+            with patch.dict(os.environ, {'RECORD_HTTP_MOCKS': 'true', 'USE_MOCK_PROVIDER': ''}):
+                recorder = requests.Session()
+                recorder.mount('http://', RecordReplayAdapter())
+            recorded = recorder.get(url, timeout=5)
+            self.assertEqual(len(os.listdir(mocks_dir.name)), 1)
+            
+            with patch.dict(os.environ, {'RECORD_HTTP_MOCKS': '', 'USE_MOCK_PROVIDER': 'true'}):
+                replayer = requests.Session()
+                replayer.mount('http://', RecordReplayAdapter())
+            replayed = replayer.get(url, timeout=5)
+            
+            # Only the recording pass reached the server
+            self.assertEqual(hits, ['/health'])
+            self.assertEqual(replayed.status_code, recorded.status_code)
+            self.assertEqual(replayed.json(), {'status': 'healthy'})
+            self.assertEqual(replayed.headers['Content-Type'], 'application/json')
+            
+            with self.assertRaises(requests.ConnectionError):
+                replayer.get(f"{url}?unrecorded=1", timeout=5)
+            self.assertEqual(hits, ['/health'])
+
+
 class TestAutoScalingFeatures(unittest.TestCase):
     """Test auto-scaling specific features"""
     